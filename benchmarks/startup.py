@@ -0,0 +1,91 @@
+"""
+Startup benchmark: import time of src.processor and time-to-first-window of the GUI.
+
+Each measurement runs in a fresh interpreter so module caches don't hide the
+cost. Run from the project root:
+
+    python benchmarks/startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROCESSOR_IMPORT = '''
+import json, sys, time
+t0 = time.perf_counter()
+import src.processor
+elapsed = time.perf_counter() - t0
+print(json.dumps({"import_s": elapsed,
+                  "tkinter_loaded": "tkinter" in sys.modules,
+                  "pil_loaded": "PIL.Image" in sys.modules}))
+'''
+
+FIRST_WINDOW = '''
+import json, sys, time
+t0 = time.perf_counter()
+import tkinter as tk
+from src import gui
+imported = time.perf_counter()
+root = tk.Tk()
+app = gui.AppWindow(root)
+root.update()
+shown = time.perf_counter()
+root.destroy()
+print(json.dumps({"import_s": imported - t0, "window_s": shown - t0,
+                  "pil_loaded": "PIL.Image" in sys.modules}))
+'''
+
+
+def run_snippet(code):
+    """Runs code in a new interpreter; returns (parsed JSON output, total wall time)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1]), wall
+
+
+def median_ms(values):
+    return statistics.median(values) * 1000
+
+
+def bench_processor_import(runs):
+    samples = [run_snippet(PROCESSOR_IMPORT) for _ in range(runs)]
+    info = samples[-1][0]
+    print(f"processor import:  {median_ms([s[0]['import_s'] for s in samples]):7.1f} ms "
+          f"(process total {median_ms([s[1] for s in samples]):.1f} ms)")
+    print(
+        f"  tkinter loaded: {info['tkinter_loaded']}, Pillow loaded: {info['pil_loaded']}")
+
+
+def bench_first_window(runs):
+    try:
+        samples = [run_snippet(FIRST_WINDOW) for _ in range(runs)]
+    except RuntimeError as e:
+        print(f"time-to-first-window: skipped ({e})")
+        return
+    print(f"gui import:        {median_ms([s[0]['import_s'] for s in samples]):7.1f} ms")
+    print(f"first window:      {median_ms([s[0]['window_s'] for s in samples]):7.1f} ms "
+          f"(process total {median_ms([s[1] for s in samples]):.1f} ms)")
+    print(f"  Pillow loaded at startup: {samples[-1][0]['pil_loaded']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    print(f"Median of {args.runs} runs ({sys.executable})")
+    bench_processor_import(args.runs)
+    bench_first_window(args.runs)
+
+
+if __name__ == "__main__":
+    main()
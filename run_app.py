@@ -3,6 +3,7 @@ import tkinter as tk
 from src import gui
 # Keep sys for potential future use (like resource_path if needed differently)
 import sys
+import multiprocessing
 
 
 def main():
@@ -18,4 +19,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for the image worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,178 @@
+import collections
+import hashlib
+import json
+import os
+import stat
+import threading
+import weakref
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint(path):
+    """Content fingerprint of a file: size plus a streaming BLAKE2b hash."""
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return f"{size}-{digest.hexdigest()}"
+
+
+def _size_of_key(key):
+    # Keys start with the input fingerprint, "<size>-<hash>|<settings>"
+    return int(key.split('-', 1)[0])
+
+
+class DedupIndex:
+    """
+    Remembers which output was produced for each (input content, settings) pair,
+    so identical inputs are only composited and encoded once.
+
+    Inputs are only hashed once another input or earlier output has the same
+    file size; an input with a unique size can't be a duplicate. Outputs of
+    unhashed inputs are kept by size and their inputs hashed when needed.
+
+    Reuse one index across batch_watermark calls to deduplicate across batches;
+    give it a state_path to also keep it across runs. Archive members are only
+    reused within the same sink.
+    """
+
+    def __init__(self, use_hardlinks=False, state_path=None):
+        self.use_hardlinks = use_hardlinks
+        self.state_path = state_path
+        self.duplicates = 0    # Images materialized from an earlier output
+        self.bytes_saved = 0   # Input bytes that didn't need decoding/encoding
+        self._outputs = {}     # key -> saved output file path
+        self._members = weakref.WeakKeyDictionary()  # sink -> {key: archive member name}
+        # size -> [(input path, size, mtime_ns, settings, output)] for inputs not hashed yet
+        self._unhashed = {}
+        self._unhashed_members = weakref.WeakKeyDictionary()  # sink -> same, for archive members
+        self._sizes = set()    # Input sizes that have a key
+        self._fingerprints = {}  # (path, size, mtime_ns) -> fingerprint
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if isinstance(state.get('outputs'), dict):
+                    self._outputs = state['outputs']
+                    for entry in state.get('unhashed', []):
+                        self._unhashed.setdefault(entry[1], []).append(tuple(entry))
+                else:
+                    self._outputs = state  # Older state files only held the outputs
+                self._sizes = {_size_of_key(key) for key in self._outputs}
+            except (OSError, ValueError, AttributeError, IndexError) as e:
+                print(f"Warning: Could not read dedup state '{state_path}': {e}")
+
+    def fingerprint(self, path):
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            # Reading a FIFO or device could block or never end
+            raise OSError(f"Not a regular file: {path}")
+        cache_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._fingerprints.get(cache_key)
+        if cached is None:
+            cached = fingerprint(path)
+            with self._lock:
+                self._fingerprints[cache_key] = cached
+        return cached
+
+    @staticmethod
+    def repeated_sizes(image_paths):
+        """File sizes that occur more than once in image_paths (only these can be duplicates of each other)."""
+        counts = collections.Counter()
+        for path in image_paths:
+            try:
+                counts[os.path.getsize(path)] += 1
+            except OSError:
+                continue
+        return {size for size, count in counts.items() if count > 1}
+
+    def make_key(self, image_path, settings, sink=None, repeated_sizes=()):
+        """
+        Key for an input file combined with the settings that affect the output,
+        or None without hashing the file when no other input (repeated_sizes)
+        or earlier output has the same size.
+        """
+        size = os.stat(image_path).st_size
+        self._hash_unhashed(size, sink)
+        with self._lock:
+            known = size in self._sizes
+        if not known and size not in repeated_sizes:
+            return None
+        return self._key(self.fingerprint(image_path), settings)
+
+    def _key(self, input_fingerprint, settings):
+        return "|".join([input_fingerprint] + [str(s) for s in settings])
+
+    def _hash_unhashed(self, size, sink):
+        """Gives earlier outputs of this input size a key, now that it may be needed."""
+        with self._lock:
+            if sink is not None:
+                entries = self._unhashed_members.get(sink, {}).pop(size, [])
+            else:
+                entries = self._unhashed.pop(size, [])
+        for input_path, _, mtime_ns, settings, output_ref in entries:
+            try:
+                st = os.stat(input_path)
+                if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    continue  # Changed since; its output no longer matches its content
+                self.record(self._key(self.fingerprint(input_path), settings), output_ref, sink)
+            except OSError:
+                continue
+
+    def lookup(self, key, sink=None):
+        """Returns the earlier output for key, or None."""
+        with self._lock:
+            if sink is not None:
+                return self._members.get(sink, {}).get(key)
+            existing = self._outputs.get(key)
+        if existing and os.path.exists(existing):
+            return existing
+        return None
+
+    def record(self, key, output_ref, sink=None):
+        with self._lock:
+            self._sizes.add(_size_of_key(key))
+            if sink is not None:
+                self._members.setdefault(sink, {})[key] = output_ref
+            else:
+                self._outputs[key] = os.path.abspath(output_ref)
+
+    def record_unhashed(self, image_path, settings, output_ref, sink=None):
+        """Remembers an output whose input had no key; the input is hashed if a same-sized one shows up."""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return
+        if not stat.S_ISREG(st.st_mode):
+            return
+        if sink is None:
+            output_ref = os.path.abspath(output_ref)
+        entry = (os.path.abspath(image_path), st.st_size, st.st_mtime_ns,
+                 [str(s) for s in settings], output_ref)
+        with self._lock:
+            if sink is not None:
+                by_size = self._unhashed_members.setdefault(sink, {})
+            else:
+                by_size = self._unhashed
+            by_size.setdefault(st.st_size, []).append(entry)
+
+    def count_saved(self, image_path):
+        with self._lock:
+            self.duplicates += 1
+            self.bytes_saved += os.path.getsize(image_path)
+
+    def save(self):
+        """Writes the file-output part of the index to state_path (if set)."""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with self._lock:
+            unhashed = [entry for entries in self._unhashed.values()
+                        for entry in entries]
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'outputs': self._outputs, 'unhashed': unhashed}, f)
+        os.replace(tmp_path, self.state_path)
@@ -1,24 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-from . import processor
-import sys
+from .icons import GUI_ICON_SIZES, cached_icon_path, resource_path
 
+# Imported on first export so Pillow stays off the startup path
+isolation = None
 
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        # We want path relative to main bundle, so go up if needed
-        base_path = sys._MEIPASS
-    except Exception:
-        # Not bundled, running in development structure
-        # Path relative to the script file's directory's PARENT (project root)
-        base_path = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), '..'))
 
-    # Assuming assets folder is directly inside the base_path (project root)
-    return os.path.join(base_path, 'assets', relative_path)
+def get_isolation():
+    global isolation
+    if isolation is None:
+        from . import isolation as loaded_isolation
+        isolation = loaded_isolation
+    return isolation
 
 
 # -- Icon Paths (Use the helper function) --
@@ -37,17 +31,6 @@ except Exception as e:
     ICON_WATERMARK = ICON_FILE = ICON_EXPORT = ICON_ARROW = APP_ICON_MACOS = None
 
 
-try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("Warning: Pillow library not found. Icons may not display correctly.")
-
-    class ImageTk:
-        @staticmethod
-        def PhotoImage(img): return None
-
 # -- Color Definitions --
 COLOR_BACKGROUND = '#2A2B2E'
 # COLOR_PANE = '#F6F7EB' # No longer needed for pane background
@@ -69,15 +52,17 @@ icons = {}
 
 
 def load_icon(path, size=None):
-    if not PIL_AVAILABLE:
-        return None
+    """
+    Loads an icon as a Tk PhotoImage from a PNG that is already at the wanted
+    size (see icons.py), so launching doesn't need Pillow or any resampling.
+    """
     if not path or not os.path.exists(path):
         return None
     try:
-        img = Image.open(path).convert("RGBA")
-        if size:
-            img = img.resize(size, Image.Resampling.LANCZOS)
-        photo_img = ImageTk.PhotoImage(img)
+        sized_path = cached_icon_path(path, size)
+        if not sized_path:
+            return None
+        photo_img = tk.PhotoImage(file=sized_path)
         icons[path] = photo_img
         return photo_img
     except Exception as e:
@@ -105,12 +90,16 @@ class AppWindow:
         self.watermark_file = tk.StringVar()
         self.output_folder = tk.StringVar()
 
-        self.icon_watermark_img = load_icon(ICON_WATERMARK, (64, 64))
+        self.icon_watermark_img = load_icon(
+            ICON_WATERMARK, GUI_ICON_SIZES['watermark_icn.png'])
         # Slightly smaller icon for top row
-        self.icon_file_img = load_icon(ICON_FILE, (48, 48))
+        self.icon_file_img = load_icon(
+            ICON_FILE, GUI_ICON_SIZES['file_icn.png'])
         # Slightly smaller icon for top row
-        self.icon_export_img = load_icon(ICON_EXPORT, (48, 48))
-        self.icon_arrow_img = load_icon(ICON_ARROW, (48, 48))
+        self.icon_export_img = load_icon(
+            ICON_EXPORT, GUI_ICON_SIZES['download_icn.png'])
+        self.icon_arrow_img = load_icon(
+            ICON_ARROW, GUI_ICON_SIZES['arrow_icn.png'])
 
         self.style = ttk.Style()
         try:
@@ -250,12 +239,23 @@ class AppWindow:
         self.frames["MainPage"].update_status("Processing... Please wait.")
         self.root.update()
         try:
-            count = processor.batch_watermark(list(
+            # Each image runs in a worker process, so a bad file can't take the app down
+            result = get_isolation().isolated_batch_watermark(list(
                 self.input_files), self.watermark_file.get(), self.output_folder.get(), position)
-            messagebox.showinfo(
-                "Success", f"Processing Complete!\n{count} images successfully watermarked in:\n{self.output_folder.get()}")
-            self.frames["MainPage"].update_status(
-                f"Processing complete. {count} images watermarked.", success=True)
+            count = result['succeeded']
+            failed = result['failed']
+            if failed:
+                failed_names = "\n".join(
+                    f"{os.path.basename(f['path'])} ({f['reason']})" for f in failed[:10])
+                messagebox.showwarning(
+                    "Processing Complete", f"{count} images successfully watermarked in:\n{self.output_folder.get()}\n\n{len(failed)} image(s) failed:\n{failed_names}")
+                self.frames["MainPage"].update_status(
+                    f"Processing complete. {count} images watermarked, {len(failed)} failed.", warning=True)
+            else:
+                messagebox.showinfo(
+                    "Success", f"Processing Complete!\n{count} images successfully watermarked in:\n{self.output_folder.get()}")
+                self.frames["MainPage"].update_status(
+                    f"Processing complete. {count} images watermarked.", success=True)
         except FileNotFoundError as e:
             messagebox.showerror("Processing Error",
                                  f"File Not Found Error:\n{e}")
@@ -437,7 +437,7 @@ class MainPage(tk.Frame):
                              bg=COLOR_BACKGROUND, fg=COLOR_TEXT_ON_DARK)
         pos_label.pack()  # Pack inside group
         self.position_combo = ttk.Combobox(position_group, values=[
-            'Bottom-Left', 'Bottom-Right', 'Top-Right', 'Top-Left', 'Center'], state="readonly", width=15)
+            'Auto', 'Bottom-Left', 'Bottom-Right', 'Top-Right', 'Top-Left', 'Center'], state="readonly", width=15)
         self.position_combo.set('Bottom-Left')
         self.position_combo.pack(pady=(2, 0))  # Pack inside group
         self.widgets_to_disable.append(self.position_combo)
@@ -566,13 +566,10 @@ class MainPage(tk.Frame):
 
 # --- Main execution ---
 if __name__ == '__main__':
-    class MockProcessor:
-        class WatermarkError(Exception):
-            pass
-
-        def batch_watermark(self, *args): print("\n--- Mock Processing ---"); import time; time.sleep(
-            1); print(f"Args: {args[:]}"); print("--- Mock Processing Complete ---"); return len(args[0])
-    processor = MockProcessor()
+    class MockIsolation:
+        def isolated_batch_watermark(self, *args): print("\n--- Mock Processing ---"); import time; time.sleep(
+            1); print(f"Args: {args[:]}"); print("--- Mock Processing Complete ---"); return {'succeeded': len(args[0]), 'outputs': {}, 'failed': []}
+    isolation = MockIsolation()
     root = tk.Tk()
     app = AppWindow(root)
     try:
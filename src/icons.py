@@ -0,0 +1,93 @@
+import os
+import sys
+
+# Sizes the GUI displays each icon at. Pre-sized copies of these are shipped in
+# assets/icons/ (regenerate with `python -m src.icons`), so no resampling or
+# Pillow import is needed at launch.
+GUI_ICON_SIZES = {
+    'watermark_icn.png': (64, 64),
+    'file_icn.png': (48, 48),
+    'download_icn.png': (48, 48),
+    'arrow_icn.png': (48, 48),
+}
+
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        # We want path relative to main bundle, so go up if needed
+        base_path = sys._MEIPASS
+    except Exception:
+        # Not bundled, running in development structure
+        # Path relative to the script file's directory's PARENT (project root)
+        base_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..'))
+
+    # Assuming assets folder is directly inside the base_path (project root)
+    return os.path.join(base_path, 'assets', relative_path)
+
+
+def user_cache_dir():
+    """Per-user folder for icons resized at runtime (when no shipped copy exists)."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'marktrix', 'icons')
+
+
+def sized_icon_name(path, size):
+    name, ext = os.path.splitext(os.path.basename(path))
+    return f"{name}_{size[0]}x{size[1]}{ext}"
+
+
+def resize_icon(path, size, dest_path):
+    """Resizes an icon with Pillow (imported here, not at startup) and saves it as PNG."""
+    from PIL import Image
+    img = Image.open(path).convert("RGBA")
+    if img.size != tuple(size):
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
+    img.save(tmp_path, format="PNG")
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def cached_icon_path(path, size):
+    """
+    Returns a PNG of the icon already at the requested size: the shipped copy in
+    assets/icons/, else a copy in the user cache (created on first use). A stale
+    cache entry (older than the source icon) is rebuilt. Returns None if the
+    icon can't be prepared.
+    """
+    if not size:
+        return path
+    name = sized_icon_name(path, size)
+    shipped = resource_path(os.path.join('icons', name))
+    if os.path.exists(shipped):
+        return shipped
+    cached = os.path.join(user_cache_dir(), name)
+    try:
+        if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path):
+            return cached
+        return resize_icon(path, size, cached)
+    except Exception as e:
+        print(f"Warning: Could not cache icon {os.path.basename(path)}: {e}")
+        return None
+
+
+def build_shipped_icons():
+    """Writes the pre-sized GUI icons into assets/icons/."""
+    for filename, size in GUI_ICON_SIZES.items():
+        dest = resource_path(os.path.join(
+            'icons', sized_icon_name(filename, size)))
+        resize_icon(resource_path(filename), size, dest)
+        print(f"Wrote {dest}")
+
+
+if __name__ == "__main__":
+    build_shipped_icons()
@@ -0,0 +1,335 @@
+import collections
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import warnings
+from multiprocessing import connection
+
+from . import dedup as dedup_index
+from . import processor
+
+# Reason codes for images that could not be processed
+REASON_TIMEOUT = 'timeout'
+REASON_MEMORY = 'memory'
+REASON_CRASHED = 'crashed'
+REASON_BOMB = 'decompression_bomb'
+REASON_UNREADABLE = 'unreadable'
+REASON_MISSING = 'missing'
+REASON_ERROR = 'error'
+
+# Pillow's own default for Image.MAX_IMAGE_PIXELS
+DEFAULT_MAX_PIXELS = 89478485
+
+# Failures that might not repeat on a fresh worker
+RETRYABLE_REASONS = (REASON_TIMEOUT, REASON_MEMORY, REASON_CRASHED)
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """Caps the worker's address space. Only available on POSIX systems."""
+    try:
+        import resource
+    except ImportError:
+        print("Warning: Memory limit not supported on this platform, running without it.")
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _reason_for(error):
+    from PIL import Image, UnidentifiedImageError
+    if isinstance(error, MemoryError):
+        return REASON_MEMORY
+    if isinstance(error, (Image.DecompressionBombError, Image.DecompressionBombWarning)):
+        return REASON_BOMB
+    if isinstance(error, FileNotFoundError):
+        return REASON_MISSING
+    if isinstance(error, UnidentifiedImageError):
+        return REASON_UNREADABLE
+    return REASON_ERROR
+
+
+def _worker_main(conn, watermark_path, output_path, position, quality, margin,
+                 memory_limit_mb, max_pixels, bomb_policy):
+    """
+    Worker process loop: receives image paths and sends back ('ok', output) or
+    ('fail', reason, detail). Before saving it sends ('reserved', path) so the
+    parent can delete a half-written output if it has to kill this worker.
+    """
+    from PIL import Image
+    if memory_limit_mb:
+        _apply_memory_limit(memory_limit_mb)
+    # Only affects this worker process, not the GUI or other callers
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    if max_pixels and bomb_policy == 'reject':
+        # Pillow only warns between 1x and 2x the limit; reject those too
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+    watermark_image_rgba = processor.load_watermark(watermark_path)
+
+    while True:
+        try:
+            image_path = conn.recv()
+        except EOFError:
+            break
+        if image_path is None:
+            break
+        try:
+            output = processor.apply_watermark(image_path, watermark_image_rgba, output_path,
+                                               position, quality=quality, raise_errors=True,
+                                               margin=margin,
+                                               on_output_reserved=lambda path: conn.send(('reserved', path)))
+            conn.send(('ok', output))
+        except Exception as e:
+            conn.send(('fail', _reason_for(e), f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, worker_args):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,) + worker_args,
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None       # (image_path, attempt)
+        self.started = None
+        self.tasks_done = 0
+        self.reserved = None   # Output file the current task is writing
+
+    def discard_partial_output(self):
+        """Deletes the output file of a task that was killed or crashed mid-save."""
+        if self.reserved and os.path.exists(self.reserved):
+            try:
+                os.remove(self.reserved)
+            except OSError as e:
+                print(f"   Warning: Could not remove partial output {self.reserved}: {e}")
+        self.reserved = None
+
+    def assign(self, task):
+        self.task = task
+        self.reserved = None
+        self.started = time.monotonic()
+        self.conn.send(task[0])
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _quarantine(quarantine_dir, failure):
+    """Copies a failed input into quarantine_dir/<reason>/ and logs it to quarantine.jsonl."""
+    reason_dir = os.path.join(quarantine_dir, failure['reason'])
+    os.makedirs(reason_dir, exist_ok=True)
+    if os.path.exists(failure['path']):
+        try:
+            shutil.copy2(failure['path'], reason_dir)
+        except OSError as e:
+            print(f"   Warning: Could not copy {failure['path']} to quarantine: {e}")
+    with open(os.path.join(quarantine_dir, 'quarantine.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(failure) + '\n')
+
+
+def isolated_batch_watermark(image_paths, watermark_path, output_path, position, quality=95,
+                             workers=None, timeout=60, memory_limit_mb=None,
+                             max_pixels=DEFAULT_MAX_PIXELS, bomb_policy='reject', retries=1,
+                             max_tasks_per_worker=50, quarantine_dir=None,
+                             margin=processor.DEFAULT_MARGIN, dedup=None):
+    """
+    Like processor.batch_watermark, but every image runs in a separate worker
+    process, so a hanging or crashing image can't take the batch (or the GUI)
+    down with it.
+
+    - timeout: seconds per image; the worker is killed and replaced when exceeded.
+    - memory_limit_mb: address-space cap per worker (POSIX only).
+    - max_pixels / bomb_policy: pixel limit applied inside the workers.
+      'reject' fails images above max_pixels, 'warn' keeps Pillow's behaviour
+      (warning above the limit, error above twice the limit).
+    - Workers are recycled after max_tasks_per_worker images.
+    - Images that time out, run out of memory or crash their worker are retried
+      up to `retries` times. Images that still fail are reported with a reason
+      code and, if quarantine_dir is set, copied there and logged.
+
+    Inputs with identical content are only sent to a worker once; the others
+    get a copy of its result (or share its failure). dedup works as in
+    processor.batch_watermark: None for a fresh index, a dedup.DedupIndex to
+    share one, False to turn it off.
+
+    Results are written to output_path (archive sinks are not used here).
+    Returns {'succeeded': int, 'outputs': {path: output}, 'failed': [failure dicts]}.
+    """
+    # Fail early on a bad watermark instead of in every worker
+    processor.load_watermark(watermark_path)
+    processor.resolve_margin(1, 1, margin)  # Raises ValueError for a bad margin before any work starts
+    if bomb_policy not in ('reject', 'warn'):
+        raise ValueError(f"Unknown decompression bomb policy: {bomb_policy}")
+
+    if not image_paths:
+        return {'succeeded': 0, 'outputs': {}, 'failed': []}
+
+    if dedup is None:
+        dedup = dedup_index.DedupIndex()
+    if dedup:
+        # Everything besides the input content that changes the output
+        settings = (dedup.fingerprint(watermark_path),
+                    position, quality, margin)
+    duplicates_before = dedup.duplicates if dedup else 0
+
+    ctx = multiprocessing.get_context('spawn')
+    worker_args = (watermark_path, output_path, position, quality, margin,
+                   memory_limit_mb, max_pixels, bomb_policy)
+    pending = collections.deque()
+    outputs = {}
+    failed = []
+    keys = {}       # path -> dedup key of inputs sent to a worker
+    followers = {}  # dedup key -> identical inputs waiting for that result
+    total_images = len(image_paths)
+
+    def reuse(existing, image_path):
+        """Materializes image_path from an earlier output. Returns False if that failed."""
+        try:
+            copied = processor.copy_output(existing, image_path, output_path,
+                                           use_hardlink=dedup.use_hardlinks)
+        except OSError as e:
+            print(f"   Warning: Deduplication skipped for {os.path.basename(image_path)} ({e})")
+            return False
+        dedup.count_saved(image_path)
+        outputs[image_path] = copied
+        return True
+
+    def record_failure(image_path, reason, detail, attempts):
+        failure = {'path': image_path, 'reason': reason,
+                   'detail': detail, 'attempts': attempts}
+        failed.append(failure)
+        print(
+            f" >> Failed to process {os.path.basename(image_path)}: {reason} ({detail})")
+        if quarantine_dir:
+            _quarantine(quarantine_dir, failure)
+
+    def handle_success(image_path, output):
+        outputs[image_path] = output
+        key = keys.get(image_path)
+        if key:
+            dedup.record(key, output)
+            for follower in followers.pop(key, []):
+                if not reuse(output, follower):
+                    pending.append((follower, 1))
+        elif dedup:
+            dedup.record_unhashed(image_path, settings, output)
+
+    def handle_failure(task, reason, detail):
+        image_path, attempt = task
+        if reason in RETRYABLE_REASONS and attempt <= retries:
+            print(
+                f" >> {os.path.basename(image_path)} failed ({reason}), retrying (attempt {attempt + 1})")
+            pending.append((image_path, attempt + 1))
+            return
+        record_failure(image_path, reason, detail, attempt)
+        # Identical inputs would fail the same way
+        for follower in followers.pop(keys.get(image_path), []):
+            record_failure(follower, reason,
+                           f"Identical to {os.path.basename(image_path)}: {detail}", 0)
+
+    # Inputs are sent out before any result comes back, so same-sized ones must be hashed up front
+    repeated_sizes = dedup.repeated_sizes(image_paths) if dedup else ()
+    for image_path in image_paths:
+        key = None
+        if dedup:
+            try:
+                key = dedup.make_key(image_path, settings,
+                                     repeated_sizes=repeated_sizes)
+            except OSError as e:
+                print(f"   Warning: Deduplication skipped for {os.path.basename(image_path)} ({e})")
+        if key in followers:
+            followers[key].append(image_path)
+            continue
+        existing = dedup.lookup(key) if key else None
+        if existing and reuse(existing, image_path):
+            continue
+        if key:
+            keys[image_path] = key
+            followers[key] = []
+        pending.append((image_path, 1))
+
+    # Only inputs that still need encoding get a worker
+    worker_count = min(workers or os.cpu_count() or 1, len(pending))
+    print(
+        f"\nStarting isolated batch processing for {total_images} images with {worker_count} workers...")
+    pool = [_Worker(ctx, worker_args) for _ in range(worker_count)]
+    try:
+        while pending or any(w.task for w in pool):
+            for w in pool:
+                if w.task is None and pending:
+                    w.assign(pending.popleft())
+
+            busy = [w for w in pool if w.task]
+            now = time.monotonic()
+            wait_for = min(max(0, w.started + timeout - now) for w in busy)
+            connection.wait([w.conn for w in busy] +
+                            [w.process.sentinel for w in busy], timeout=wait_for)
+
+            now = time.monotonic()
+            for i, w in enumerate(pool):
+                if w.task is None:
+                    continue
+                finished = False
+                replace = False
+                try:
+                    while w.conn.poll():
+                        message = w.conn.recv()
+                        if message[0] == 'reserved':
+                            w.reserved = message[1]
+                            continue
+                        if message[0] == 'ok':
+                            handle_success(w.task[0], message[1])
+                        else:
+                            handle_failure(w.task, message[1], message[2])
+                            # A worker that ran out of memory may be in a bad state
+                            replace = message[1] == REASON_MEMORY
+                        finished = True
+                        break
+                except (EOFError, OSError):
+                    pass  # Worker died, handled below
+                if finished:
+                    w.task = None
+                    w.reserved = None
+                    w.tasks_done += 1
+                    replace = replace or w.tasks_done >= max_tasks_per_worker
+                elif not w.process.is_alive() or w.conn.closed:
+                    w.discard_partial_output()
+                    handle_failure(w.task, REASON_CRASHED,
+                                   f"Worker exited with code {w.process.exitcode}")
+                    replace = True
+                elif now - w.started > timeout:
+                    w.stop(kill=True)
+                    w.discard_partial_output()
+                    handle_failure(w.task, REASON_TIMEOUT,
+                                   f"No result after {timeout}s")
+                    w.task = None
+                    pool[i] = _Worker(ctx, worker_args)
+                    continue
+                if replace:
+                    w.task = None
+                    w.stop(kill=not w.process.is_alive())
+                    pool[i] = _Worker(ctx, worker_args)
+    finally:
+        for w in pool:
+            w.stop(kill=w.task is not None)
+            w.discard_partial_output()
+
+    print(
+        f"Batch processing finished. {len(outputs)}/{total_images} images processed successfully, {len(failed)} failed.")
+    if dedup:
+        saved = dedup.duplicates - duplicates_before
+        if saved:
+            print(
+                f"Deduplication: {saved} image(s) reused an earlier result ({dedup.duplicates} total, {dedup.bytes_saved / (1024 * 1024):.1f} MB of input skipped).")
+        dedup.save()
+    return {'succeeded': len(outputs), 'outputs': outputs, 'failed': failed}
@@ -1,14 +1,48 @@
-from PIL import Image, ImageOps  # ImageOps is imported if you use it later
+import io
 import os
+import shutil
+
+from . import dedup as dedup_index
 
 
 class WatermarkError(Exception):
     pass
 
 
+# Input extensions picked up when scanning folders
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp',
+                        '.tiff', '.tif', '.webp', '.gif')
+
+
 # Keep margin adjusted here
-def calculate_position(base_width, base_height, wm_width, wm_height, position, margin=50):
-    """Calculates the (x, y) coordinates for the watermark's top-left corner."""
+DEFAULT_MARGIN = 50
+
+AUTO_POSITION = 'Auto'
+# Anchors 'Auto' chooses from, in order of preference on ties
+AUTO_CANDIDATES = ['Bottom-Right', 'Bottom-Left', 'Top-Right', 'Top-Left']
+# Longest side (px) of the low-resolution copy used to pick the 'Auto' anchor
+ANALYSIS_SIZE = 256
+
+
+def resolve_margin(base_width, base_height, margin):
+    """
+    Margin in pixels. An int is used as-is, a float is a fraction of the shorter
+    image side and must be in [0, 0.5) (use an int for a pixel margin).
+    """
+    if isinstance(margin, float):
+        if not 0 <= margin < 0.5:
+            raise ValueError(
+                f"Fractional margin must be between 0 and 0.5, got {margin}. Use an int for pixels.")
+        return round(min(base_width, base_height) * margin)
+    return margin
+
+
+def calculate_position(base_width, base_height, wm_width, wm_height, position, margin=DEFAULT_MARGIN):
+    """
+    Calculates the (x, y) coordinates for the watermark's top-left corner.
+    margin is in pixels, or a fraction of the shorter image side if given as a float (e.g. 0.03).
+    """
+    margin = resolve_margin(base_width, base_height, margin)
     # --- Calculate x ---
     if position in ['Bottom-Right', 'Top-Right']:
         x = base_width - wm_width - margin
@@ -36,11 +70,90 @@ def calculate_position(base_width, base_height, wm_width, wm_height, position, m
     return (x, y)
 
 
-def apply_watermark(image_path, watermark_image_rgba, output_path, position, quality=95):
+def choose_auto_position(base_image, watermark_image_rgba, margin=DEFAULT_MARGIN):
+    """
+    Picks the anchor from AUTO_CANDIDATES where the watermark is most readable:
+    the area with the fewest edges and least contrast, and whose brightness
+    differs most from the watermark's. Works on a nearest-sampled copy of at
+    most ANALYSIS_SIZE px, so it costs well under a few ms even for 50 MP images.
+    """
+    from PIL import Image, ImageFilter, ImageStat
+    base_width, base_height = base_image.size
+    wm_width, wm_height = watermark_image_rgba.size
+    scale = min(1.0, ANALYSIS_SIZE / max(base_width, base_height))
+
+    def small(img):
+        size = (max(1, round(img.width * scale)),
+                max(1, round(img.height * scale)))
+        return img.resize(size, Image.Resampling.NEAREST)
+
+    wm_small = small(watermark_image_rgba)
+    wm_alpha = wm_small.getchannel('A')
+    if not wm_alpha.getbbox():
+        return AUTO_CANDIDATES[0]  # Fully transparent watermark, nothing to optimize
+    wm_luma = ImageStat.Stat(wm_small.convert('L'), mask=wm_alpha).mean[0]
+
+    thumb = small(base_image).convert('L')
+    edges = thumb.filter(ImageFilter.FIND_EDGES)
+
+    best_position, best_score = AUTO_CANDIDATES[0], None
+    for candidate in AUTO_CANDIDATES:
+        x, y = calculate_position(
+            base_width, base_height, wm_width, wm_height, candidate, margin)
+        box = (int(x * scale), int(y * scale),
+               min(thumb.width, max(int(x * scale) + 1, round((x + wm_width) * scale))),
+               min(thumb.height, max(int(y * scale) + 1, round((y + wm_height) * scale))))
+        region = ImageStat.Stat(thumb.crop(box))
+        edge_density = ImageStat.Stat(edges.crop(box)).mean[0]
+        busyness = min(1.0, edge_density / 64) + 0.5 * \
+            min(1.0, region.stddev[0] / 64)
+        luminance_gap = abs(region.mean[0] - wm_luma) / 255
+        score = busyness - luminance_gap
+        if best_score is None or score < best_score:
+            best_position, best_score = candidate, score
+    return best_position
+
+
+def output_base_name(image_path):
+    """Output name (without extension) for an input image, e.g. 'photo_watermarked'."""
+    name, _ = os.path.splitext(os.path.basename(image_path))
+    return f"{name}_watermarked"
+
+
+def reserve_output_file(output_path, base_output_name, output_extension):
+    """
+    Creates the output file exclusively, adding (1), (2), etc. on collisions.
+    Exclusive creation keeps names unique when several workers save at once.
+    Returns (filename, open binary file).
+    """
+    output_filename = f"{base_output_name}{output_extension}"
+    counter = 1
+    while True:
+        try:
+            output_file = open(os.path.join(
+                output_path, output_filename), 'xb')
+            return output_filename, output_file
+        except FileExistsError:
+            output_filename = f"{base_output_name}({counter}){output_extension}"
+            counter += 1
+
+
+def apply_watermark(image_path, watermark_image_rgba, output_path, position, quality=95, sink=None, raise_errors=False,
+                    margin=DEFAULT_MARGIN, on_output_reserved=None):
     """
     Applies watermark (passed as RGBA Pillow object) to a single image
     and saves the result in the original image's format where possible.
+    position 'Auto' picks the clearest corner for each image (see choose_auto_position).
+    If a sink (see sinks.py) is given, the encoded image is written into it
+    instead of output_path.
+    on_output_reserved, if given, is called with the output file path after the
+    name is reserved and before saving, so a supervisor can clean up if this
+    process is killed mid-save.
+    Returns the saved file path (or archive member name), or False on failure
+    (or re-raises the error when raise_errors is set).
     """
+    # Pillow is imported on first use to keep `import processor` cheap
+    from PIL import Image, ImageOps
     try:
         # Open the base image
         base_image_opened = Image.open(image_path)
@@ -65,8 +178,11 @@ def apply_watermark(image_path, watermark_image_rgba, output_path, position, qua
         base_width, base_height = base_for_paste.size
 
         # Calculates Position
+        if position == AUTO_POSITION:
+            position = choose_auto_position(base_image, wm_image, margin)
+            print(f"   Auto position: {position}")
         pos = calculate_position(
-            base_width, base_height, wm_width, wm_height, position)
+            base_width, base_height, wm_width, wm_height, position, margin)
 
         # Pastes Watermark
         base_for_paste.paste(wm_image, pos, wm_image)
@@ -133,26 +249,39 @@ def apply_watermark(image_path, watermark_image_rgba, output_path, position, qua
             save_options = {'optimize': True}
 
         # Constructs Output Filename AND Handle Collisions
-        base_filename = os.path.basename(image_path)
-        name, _ = os.path.splitext(base_filename)
-        base_output_name = f"{name}_watermarked"
-
-        output_filename = f"{base_output_name}{output_extension}"
-        full_output_path = os.path.join(output_path, output_filename)
-        counter = 1
-        while os.path.exists(full_output_path):
-            output_filename = f"{base_output_name}({counter}){output_extension}"
-            full_output_path = os.path.join(output_path, output_filename)
-            counter += 1
+        base_output_name = output_base_name(image_path)
+
+        if sink is not None:
+            # Encode in memory and stream into the archive
+            buffer = io.BytesIO()
+            final_image_to_save.save(
+                buffer, format=save_format, **save_options)
+            output_filename = sink.write(
+                base_output_name, output_extension, buffer.getvalue())
+            print(f"   Saved as {save_format} into archive: {output_filename}")
+            return output_filename
+
+        output_filename, output_file = reserve_output_file(
+            output_path, base_output_name, output_extension)
+        if on_output_reserved:
+            on_output_reserved(os.path.join(output_path, output_filename))
 
         # Save in Determined Format
         print(f"   Saving as {save_format} to: {output_filename}")
-        final_image_to_save.save(
-            full_output_path, format=save_format, **save_options)
+        try:
+            with output_file:
+                final_image_to_save.save(
+                    output_file, format=save_format, **save_options)
+        except Exception:
+            # Don't leave a half-written file behind
+            os.remove(os.path.join(output_path, output_filename))
+            raise
 
-        return True
+        return os.path.join(output_path, output_filename)
 
     except Exception as e:
+        if raise_errors:
+            raise
         print(
             f"Error processing {os.path.basename(image_path)}: {type(e).__name__} - {e}")
         import traceback
@@ -160,16 +289,73 @@ def apply_watermark(image_path, watermark_image_rgba, output_path, position, qua
         return False
 
 
-def batch_watermark(image_paths, watermark_path, output_path, position, quality=95):
-    """Processes a batch of images, saving results in original format where possible."""
+def copy_output(existing_ref, image_path, output_path, sink=None, use_hardlink=False):
+    """
+    Materializes an already watermarked result for another input with identical
+    content: a copy (or hardlink) on disk, or a duplicate member in the sink.
+    Returns the new file path (or archive member name).
+    """
+    base_output_name = output_base_name(image_path)
+    _, output_extension = os.path.splitext(existing_ref)
+    if sink is not None:
+        return sink.write_duplicate(existing_ref, base_output_name, output_extension)
+
+    output_filename, output_file = reserve_output_file(
+        output_path, base_output_name, output_extension)
+    output_file.close()
+    full_output_path = os.path.join(output_path, output_filename)
+    if use_hardlink:
+        tmp_path = f"{full_output_path}.tmp"
+        try:
+            os.link(existing_ref, tmp_path)
+            os.replace(tmp_path, full_output_path)
+            return full_output_path
+        except OSError:
+            # Different filesystem or no hardlink support, fall back to a copy
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    try:
+        shutil.copyfile(existing_ref, full_output_path)
+    except Exception:
+        # Don't leave the reserved (empty) file behind
+        os.remove(full_output_path)
+        raise
+    return full_output_path
+
+
+def load_watermark(watermark_path):
+    """Loads the watermark file as an RGBA Pillow image."""
+    from PIL import Image
     if not os.path.exists(watermark_path):
         raise FileNotFoundError(f"Watermark file not found: {watermark_path}")
     try:
-        watermark_image_rgba = Image.open(watermark_path).convert("RGBA")
+        return Image.open(watermark_path).convert("RGBA")
     except Exception as e:
         raise WatermarkError(
             f"Could not load or convert watermark file '{os.path.basename(watermark_path)}': {e}") from e
 
+
+def batch_watermark(image_paths, watermark_path, output_path, position, quality=95, sink=None, dedup=None,
+                    margin=DEFAULT_MARGIN):
+    """
+    Processes a batch of images, saving results in original format where possible.
+    Pass a sink (e.g. sinks.open_archive_sink("out.zip")) to stream results into
+    an archive instead of output_path; the caller closes the sink.
+    Inputs with identical content are only encoded once. dedup=None uses a fresh
+    index for this batch; pass a dedup.DedupIndex to share it across batches,
+    or False to turn deduplication off.
+    """
+    watermark_image_rgba = load_watermark(watermark_path)
+    resolve_margin(1, 1, margin)  # Raises ValueError for a bad margin before any work starts
+
+    if dedup is None:
+        dedup = dedup_index.DedupIndex()
+    if dedup:
+        # Everything besides the input content that changes the output
+        settings = (dedup.fingerprint(watermark_path),
+                    position, quality, margin)
+    duplicates_before = dedup.duplicates if dedup else 0
+
     success_count = 0
     total_images = len(image_paths)
     print(f"\nStarting batch processing for {total_images} images...")
@@ -177,12 +363,42 @@ def batch_watermark(image_paths, watermark_path, output_path, position, quality=
     for i, img_path in enumerate(image_paths):
         print(
             f"Processing image {i+1}/{total_images}: {os.path.basename(img_path)} ...")
+
+        key = None
+        if dedup:
+            try:
+                key = dedup.make_key(img_path, settings, sink)
+                existing = dedup.lookup(key, sink) if key else None
+                if existing:
+                    copied = copy_output(existing, img_path, output_path,
+                                         sink=sink, use_hardlink=dedup.use_hardlinks)
+                    dedup.count_saved(img_path)
+                    print(
+                        f"   Identical to an earlier input, reused result as: {os.path.basename(copied)}")
+                    success_count += 1
+                    continue
+            except (OSError, KeyError) as e:
+                # KeyError: the earlier member is not in this archive
+                print(f"   Warning: Deduplication skipped ({e})")
+
         # Pass quality setting down
-        if apply_watermark(img_path, watermark_image_rgba, output_path, position, quality=quality):
+        result = apply_watermark(img_path, watermark_image_rgba, output_path, position,
+                                 quality=quality, sink=sink, margin=margin)
+        if result:
             success_count += 1
+            if key:
+                dedup.record(key, result, sink)
+            elif dedup:
+                dedup.record_unhashed(img_path, settings, result, sink)
         else:
             print(f" >> Failed to process {os.path.basename(img_path)}")
 
     print(
         f"Batch processing finished. {success_count}/{total_images} images processed successfully.")
+    if dedup:
+        saved = dedup.duplicates - duplicates_before
+        if saved:
+            print(
+                f"Deduplication: {saved} image(s) reused an earlier result ({dedup.duplicates} total, {dedup.bytes_saved / (1024 * 1024):.1f} MB of input skipped).")
+        dedup.save()
     return success_count
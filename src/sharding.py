@@ -0,0 +1,411 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from . import processor
+
+DEFAULT_LEASE_SECONDS = 120
+# Longest wait before rechecking items claimed by other workers
+CLAIM_RECHECK_SECONDS = 2.0
+
+
+def item_id(image_path):
+    """Stable id for a work item, the same on every host given the same path string."""
+    return hashlib.sha1(image_path.encode('utf-8')).hexdigest()
+
+
+def select_shard(image_paths, shard_index, shard_count):
+    """Deterministic hash sharding: returns the paths that belong to shard_index."""
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"Shard index {shard_index} out of range for {shard_count} shards.")
+    return [p for p in image_paths if int(item_id(p), 16) % shard_count == shard_index]
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkDir:
+    """
+    Shared work directory used by cooperating workers:
+
+        claims/<item>.lock     held while a worker processes an item
+        done/<item>            written once an item is finished (ok or failed)
+        progress/<worker>.json per-worker counters for the report's worker lines
+
+    A claim whose lock file hasn't been touched for lease_seconds is treated as
+    left behind by a dead worker and can be taken over. Workers on different
+    hosts compare against file mtimes, so keep the lease well above clock skew.
+    """
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.claims_dir = os.path.join(path, 'claims')
+        self.done_dir = os.path.join(path, 'done')
+        self.progress_dir = os.path.join(path, 'progress')
+        for d in (self.claims_dir, self.done_dir, self.progress_dir):
+            os.makedirs(d, exist_ok=True)
+
+    @property
+    def heartbeat_interval(self):
+        return max(1.0, self.lease_seconds / 3)
+
+    def _lock_path(self, key):
+        return os.path.join(self.claims_dir, f"{key}.lock")
+
+    def is_done(self, key):
+        return os.path.exists(os.path.join(self.done_dir, key))
+
+    def mark_done(self, key, image_path, worker_id, ok):
+        with open(os.path.join(self.done_dir, key), 'w', encoding='utf-8') as f:
+            json.dump({'path': image_path, 'worker': worker_id, 'ok': bool(ok),
+                      'time': time.time()}, f)
+
+    def _create_lock(self, key, worker_id):
+        try:
+            fd = os.open(self._lock_path(key),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': worker_id, 'time': time.time()}, f)
+        return True
+
+    def _is_stale(self, path):
+        return time.time() - os.stat(path).st_mtime > self.lease_seconds
+
+    def claim(self, key, worker_id):
+        """Tries to claim an item. Expired claims from dead workers are taken over."""
+        if self._create_lock(key, worker_id):
+            return True
+        lock_path = self._lock_path(key)
+        try:
+            if not self._is_stale(lock_path):
+                return False
+            # Only one worker can rename the stale lock away
+            stale_path = f"{lock_path}.stale-{worker_id}"
+            os.rename(lock_path, stale_path)
+        except FileNotFoundError:
+            return self._create_lock(key, worker_id)
+        if not self._is_stale(stale_path):
+            # Lost a race and moved someone's fresh claim, put it back
+            try:
+                os.link(stale_path, lock_path)
+            except OSError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+        print(f"   Took over expired claim {key[:10]}")
+        return self._create_lock(key, worker_id)
+
+    def heartbeat(self, key):
+        try:
+            os.utime(self._lock_path(key))
+        except FileNotFoundError:
+            pass
+
+    def release(self, key):
+        try:
+            os.remove(self._lock_path(key))
+        except FileNotFoundError:
+            pass
+
+    def write_progress(self, worker_id, progress):
+        path = os.path.join(self.progress_dir, f"{worker_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, path)
+
+
+def merge_progress(work_dir, image_paths=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Builds one report for the whole work directory. Totals come from the done
+    markers and the claim files, so they don't depend on which worker did what
+    or on progress files left over from earlier runs. Pass the input list to
+    also get the number of items nobody has started yet.
+    """
+    work = WorkDir(work_dir, lease_seconds)
+    report = {'processed': 0, 'failed': 0, 'in_progress': 0, 'expired_claims': 0,
+              'pending': None, 'failed_items': [], 'workers': []}
+
+    done_keys = set()
+    for key in sorted(os.listdir(work.done_dir)):
+        try:
+            with open(os.path.join(work.done_dir, key), 'r', encoding='utf-8') as f:
+                marker = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read done marker '{key}': {e}")
+            continue
+        done_keys.add(key)
+        if marker.get('ok'):
+            report['processed'] += 1
+        else:
+            report['failed'] += 1
+            report['failed_items'].append(marker.get('path', key))
+
+    claimed_keys = set()
+    for name in os.listdir(work.claims_dir):
+        if not name.endswith('.lock'):
+            continue  # Stale locks being taken over right now
+        key = name[:-len('.lock')]
+        if key in done_keys:
+            continue
+        claimed_keys.add(key)
+        try:
+            stale = work._is_stale(os.path.join(work.claims_dir, name))
+        except FileNotFoundError:
+            continue
+        report['expired_claims' if stale else 'in_progress'] += 1
+
+    if image_paths is not None:
+        report['pending'] = sum(1 for p in image_paths
+                                if item_id(p) not in done_keys and item_id(p) not in claimed_keys)
+
+    for name in sorted(os.listdir(work.progress_dir)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(work.progress_dir, name), 'r', encoding='utf-8') as f:
+                report['workers'].append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read progress file '{name}': {e}")
+    return report
+
+
+class _Heartbeat:
+    """Keeps touching the current claim while an image is being processed."""
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.key = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.work_dir.heartbeat_interval):
+            key = self.key
+            if key:
+                self.work_dir.heartbeat(key)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(image_paths, watermark_path, output_path, position, work_dir, quality=95,
+               worker_id=None, shard=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Runs one worker over a shared input set.
+
+    With shard=(index, count) the worker processes its deterministic hash shard.
+    Without it, workers claim items one at a time through lock files in
+    work_dir, so any number of workers can join or die mid-run. Items locked
+    by another worker are checked again every heartbeat interval until they
+    are done, so claims left by a dead worker are taken over once they expire.
+    Returns this worker's progress dict.
+    """
+    worker_id = worker_id or default_worker_id()
+    work = WorkDir(work_dir, lease_seconds)
+    watermark_image_rgba = processor.load_watermark(watermark_path)
+
+    progress = {'worker': worker_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+                'shard': list(shard) if shard else None, 'processed': 0, 'failed': 0,
+                'failed_items': [], 'started': time.time(), 'finished': None}
+
+    if shard:
+        items = select_shard(image_paths, *shard)
+        print(
+            f"\nWorker {worker_id}: shard {shard[0]}/{shard[1]} with {len(items)} images.")
+    else:
+        # Start at a worker-specific offset so workers don't fight over the same items
+        items = list(image_paths)
+        if items:
+            offset = int(item_id(worker_id), 16) % len(items)
+            items = items[offset:] + items[:offset]
+        print(
+            f"\nWorker {worker_id}: claiming from {len(items)} images in {work_dir}.")
+
+    with _Heartbeat(work) as heartbeat:
+        remaining = items
+        while remaining:
+            claimed_elsewhere = []
+            for img_path in remaining:
+                key = item_id(img_path)
+                if work.is_done(key):
+                    continue
+                if not shard and not work.claim(key, worker_id):
+                    claimed_elsewhere.append(img_path)
+                    continue
+                try:
+                    if work.is_done(key):  # Finished while we were claiming
+                        continue
+                    heartbeat.key = key
+                    print(f"Processing {os.path.basename(img_path)} ...")
+                    ok = processor.apply_watermark(img_path, watermark_image_rgba, output_path,
+                                                   position, quality=quality)
+                    heartbeat.key = None
+                    work.mark_done(key, img_path, worker_id, ok)
+                    if ok:
+                        progress['processed'] += 1
+                    else:
+                        progress['failed'] += 1
+                        progress['failed_items'].append(img_path)
+                        print(
+                            f" >> Failed to process {os.path.basename(img_path)}")
+                finally:
+                    heartbeat.key = None
+                    if not shard:
+                        work.release(key)
+                progress['updated'] = time.time()
+                work.write_progress(worker_id, progress)
+
+            # Wait for other workers to finish these, or for their claims to expire
+            remaining = claimed_elsewhere
+            if remaining:
+                time.sleep(min(work.heartbeat_interval, CLAIM_RECHECK_SECONDS))
+
+    progress['finished'] = time.time()
+    work.write_progress(worker_id, progress)
+    print(
+        f"Worker {worker_id} finished: {progress['processed']} processed, {progress['failed']} failed.")
+    return progress
+
+
+def _worker_entry(args):
+    image_paths, watermark_path, output_path, position, work_dir, quality, worker_id, shard, lease = args
+    run_worker(image_paths, watermark_path, output_path, position, work_dir, quality=quality,
+               worker_id=worker_id, shard=shard, lease_seconds=lease)
+
+
+def run_local(worker_count, image_paths, watermark_path, output_path, position, work_dir,
+              quality=95, sharded=False, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Starts worker_count worker processes on this machine and returns the merged
+    report. Workers that exit with a non-zero code are listed in
+    report['crashed_workers'] as (worker id, exit code).
+    """
+    jobs = []
+    for i in range(worker_count):
+        shard = (i, worker_count) if sharded else None
+        jobs.append((list(image_paths), watermark_path, output_path, position, work_dir,
+                     quality, f"{default_worker_id()}-w{i}", shard, lease_seconds))
+    processes = [multiprocessing.Process(
+        target=_worker_entry, args=(job,)) for job in jobs]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    report = merge_progress(work_dir, image_paths, lease_seconds)
+    report['crashed_workers'] = [(job[6], p.exitcode)
+                                 for job, p in zip(jobs, processes) if p.exitcode != 0]
+    for worker_id, exitcode in report['crashed_workers']:
+        print(f"Warning: Worker {worker_id} exited with code {exitcode}")
+    return report
+
+
+def _collect_inputs(sources):
+    """Expands folders and list files (one path per line) into image paths."""
+    image_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            image_paths.extend(sorted(
+                os.path.join(source, name) for name in os.listdir(source)
+                if name.lower().endswith(processor.SUPPORTED_EXTENSIONS)))
+        elif source.lower().endswith(processor.SUPPORTED_EXTENSIONS):
+            image_paths.append(source)
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                image_paths.extend(line.strip() for line in f if line.strip())
+    return image_paths
+
+
+def _print_report(report):
+    pending = f", {report['pending']} pending" if report['pending'] is not None else ""
+    print(
+        f"\nTotal: {report['processed']} processed, {report['failed']} failed, {report['in_progress']} in progress, "
+        f"{report['expired_claims']} expired claim(s){pending}.")
+    for w in report['workers']:
+        shard = f" shard {w['shard'][0]}/{w['shard'][1]}" if w.get(
+            'shard') else ""
+        state = "finished" if w.get('finished') else "running/stopped"
+        print(
+            f"  {w['worker']}{shard}: {w['processed']} processed, {w['failed']} failed ({state})")
+    for worker_id, exitcode in report.get('crashed_workers', []):
+        print(f"  {worker_id}: exited with code {exitcode}")
+    for path in report['failed_items']:
+        print(f"  Failed: {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Split one batch across several worker processes or hosts.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    worker = sub.add_parser('worker', help="Run one worker")
+    worker.add_argument('watermark')
+    worker.add_argument('output_dir')
+    worker.add_argument('inputs', nargs='+',
+                        help="Image files, folders, or text files listing paths")
+    worker.add_argument('--work-dir', required=True)
+    worker.add_argument('--position', default='Bottom-Right')
+    worker.add_argument('--quality', type=int, default=95)
+    mode = worker.add_mutually_exclusive_group()
+    mode.add_argument('--shard', default=None,
+                      help="INDEX/COUNT for hash sharding instead of claiming")
+    worker.add_argument('--worker-id', default=None)
+    worker.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Seconds before an untouched claim expires")
+    mode.add_argument('--local-workers', type=int, default=0,
+                      help="Start this many worker processes on this machine")
+    worker.add_argument('--sharded', action='store_true',
+                        help="With --local-workers, hash-shard instead of claiming")
+
+    report = sub.add_parser('report', help="Print the merged progress report")
+    report.add_argument('--work-dir', required=True)
+    report.add_argument('inputs', nargs='*',
+                        help="Optional inputs, to also count pending images")
+    report.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS)
+
+    args = parser.parse_args(argv)
+    if args.command == 'report':
+        image_paths = _collect_inputs(args.inputs) if args.inputs else None
+        _print_report(merge_progress(
+            args.work_dir, image_paths, args.lease))
+        return
+    if args.sharded and not args.local_workers:
+        parser.error("--sharded only applies with --local-workers; use --shard INDEX/COUNT for a single worker")
+
+    image_paths = _collect_inputs(args.inputs)
+    if args.local_workers:
+        report = run_local(args.local_workers, image_paths, args.watermark, args.output_dir,
+                           args.position, args.work_dir, quality=args.quality,
+                           sharded=args.sharded, lease_seconds=args.lease)
+        _print_report(report)
+        if report['crashed_workers']:
+            sys.exit(1)
+        return
+    shard = None
+    if args.shard:
+        index, count = (int(v) for v in args.shard.split('/'))
+        shard = (index, count)
+    run_worker(image_paths, args.watermark, args.output_dir, args.position, args.work_dir,
+               quality=args.quality, worker_id=args.worker_id, shard=shard, lease_seconds=args.lease)
+
+
+if __name__ == "__main__":
+    main()
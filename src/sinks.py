@@ -0,0 +1,145 @@
+import abc
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+
+class ArchiveSink(abc.ABC):
+    """
+    Output sink that streams encoded images straight into one archive file
+    instead of writing each result into the output folder.
+    Writes are serialized with a lock, so several threads in one process can
+    feed the same sink. It is not process-safe: worker processes must hand
+    their encoded bytes to a single writer process.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._lock = threading.Lock()
+        self._names = set()
+        self.count = 0
+
+    def _unique_name(self, base_name, extension):
+        # Same "(1)", "(2)" scheme used for files on disk
+        name = f"{base_name}{extension}"
+        counter = 1
+        while name in self._names:
+            name = f"{base_name}({counter}){extension}"
+            counter += 1
+        self._names.add(name)
+        return name
+
+    def write(self, base_name, extension, data):
+        """Adds encoded image bytes to the archive. Returns the member name used."""
+        with self._lock:
+            name = self._unique_name(base_name, extension)
+            self._write_member(name, data)
+            self.count += 1
+        return name
+
+    def write_duplicate(self, existing_name, base_name, extension):
+        """
+        Adds another member with the same content as existing_name. Returns the new name.
+        Raises KeyError if existing_name is not in this archive.
+        """
+        with self._lock:
+            if existing_name not in self._names:
+                raise KeyError(existing_name)
+            name = self._unique_name(base_name, extension)
+            self._write_duplicate_member(existing_name, name)
+            self.count += 1
+        return name
+
+    @abc.abstractmethod
+    def _write_member(self, name, data):
+        """Stores data under name. Called with the lock held."""
+
+    @abc.abstractmethod
+    def _write_duplicate_member(self, existing_name, name):
+        """Stores the content of existing_name again under name. Called with the lock held."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Finishes and closes the archive file."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ZipSink(ArchiveSink):
+    """Writes results into a ZIP file. Images are stored uncompressed by default since they are already compressed."""
+
+    def __init__(self, archive_path, compression=zipfile.ZIP_STORED):
+        super().__init__(archive_path)
+        self._zip = zipfile.ZipFile(
+            archive_path, 'w', compression=compression, allowZip64=True)
+
+    def _write_member(self, name, data):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self._zip.compression
+        self._zip.writestr(info, data)
+
+    def _write_duplicate_member(self, existing_name, name):
+        # ZIP has no links; read the bytes back from the archive being written
+        self._write_member(name, self._zip.read(existing_name))
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+
+class TarSink(ArchiveSink):
+    """Writes results into a TAR file (.tar, .tar.gz/.tgz, .tar.bz2, .tar.xz)."""
+
+    def __init__(self, archive_path):
+        super().__init__(archive_path)
+        self._tar = tarfile.open(archive_path, _tar_mode(archive_path))
+
+    def _write_member(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def _write_duplicate_member(self, existing_name, name):
+        # Hard link member, no data is stored twice
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.LNKTYPE
+        info.linkname = existing_name
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info)
+
+    def close(self):
+        with self._lock:
+            self._tar.close()
+
+
+def _tar_mode(archive_path):
+    lower = archive_path.lower()
+    if lower.endswith(('.tar.gz', '.tgz')):
+        return 'w:gz'
+    if lower.endswith(('.tar.bz2', '.tbz2')):
+        return 'w:bz2'
+    if lower.endswith(('.tar.xz', '.txz')):
+        return 'w:xz'
+    return 'w'
+
+
+def open_archive_sink(archive_path):
+    """Picks a ZIP or TAR sink based on the archive file extension."""
+    lower = archive_path.lower()
+    if lower.endswith('.zip'):
+        return ZipSink(archive_path)
+    if lower.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')):
+        return TarSink(archive_path)
+    raise ValueError(
+        f"Unsupported archive type for '{os.path.basename(archive_path)}'. Use .zip or .tar(.gz/.bz2/.xz).")
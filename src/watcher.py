@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import processor
+
+STATE_FILENAME = '.marktrix_watch_state.json'
+
+
+def file_signature(entry):
+    """Cheap change marker for a file: (size, mtime in ns)."""
+    st = entry.stat()
+    return (st.st_size, st.st_mtime_ns)
+
+
+class FolderWatcher:
+    """
+    Watches a hot folder by polling and watermarks new or changed images.
+
+    A file is only processed once its size and mtime have stayed the same for
+    settle_seconds, so images that are still being copied in are skipped until
+    they are complete. Processed signatures are kept in a JSON state file, so a
+    restart only handles what changed while the watcher was down. When a file
+    changes, its new result replaces the output written for it before.
+    """
+
+    def __init__(self, input_dir, watermark_path, output_path, position, quality=95,
+                 poll_interval=2.0, settle_seconds=3.0, workers=None, state_path=None):
+        if os.path.realpath(output_path) == os.path.realpath(input_dir):
+            # Outputs would be picked up as new images and watermarked again
+            raise ValueError(
+                "The output folder must be different from the watched folder.")
+        self.input_dir = input_dir
+        self.output_path = output_path
+        self.position = position
+        self.quality = quality
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.workers = workers or os.cpu_count() or 1
+        self.state_path = state_path or os.path.join(
+            output_path, STATE_FILENAME)
+        self.watermark_image_rgba = processor.load_watermark(watermark_path)
+
+        # All keyed by file name, so the state doesn't depend on how input_dir is spelled
+        self.processed = {}  # name -> signature of last successful run
+        self.failed = {}     # name -> signature that failed (retried once changed)
+        self.outputs = {}    # name -> output file name in output_path
+        self._pending = {}   # name -> (signature, time first seen with it)
+        self._load_state()
+
+    # --- State ---
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            # basename() also reads older state files that were keyed by full path
+            self.processed = {os.path.basename(p): tuple(sig)
+                              for p, sig in state.get('processed', {}).items()}
+            self.failed = {os.path.basename(p): tuple(sig)
+                           for p, sig in state.get('failed', {}).items()}
+            self.outputs = state.get('outputs', {})
+            print(
+                f"Loaded watch state: {len(self.processed)} processed, {len(self.failed)} failed.")
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read watch state '{self.state_path}': {e}")
+
+    def save_state(self):
+        """Writes the state file atomically (temp file + rename)."""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'processed': self.processed,
+                      'failed': self.failed, 'outputs': self.outputs}, f)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Scanning ---
+    def scan(self):
+        """Returns {name: signature} for all supported images in input_dir."""
+        found = {}
+        with os.scandir(self.input_dir) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                if not entry.name.lower().endswith(processor.SUPPORTED_EXTENSIONS):
+                    continue
+                try:
+                    found[entry.name] = file_signature(entry)
+                except OSError:
+                    continue  # Removed between listing and stat
+        return found
+
+    def collect_ready(self, now=None):
+        """Scans once and returns (name, signature) for files that are new/changed and have settled."""
+        now = time.monotonic() if now is None else now
+        current = self.scan()
+        ready = []
+        for name, sig in current.items():
+            if self.processed.get(name) == sig or self.failed.get(name) == sig:
+                continue
+            pending = self._pending.get(name)
+            if pending is None or pending[0] != sig:
+                # New or still changing, restart the debounce timer
+                self._pending[name] = (sig, now)
+            elif now - pending[1] >= self.settle_seconds:
+                ready.append((name, sig))
+        # Forget files that disappeared before settling
+        for name in list(self._pending):
+            if name not in current:
+                del self._pending[name]
+        return ready
+
+    # --- Processing ---
+    def _process_one(self, name):
+        return processor.apply_watermark(os.path.join(self.input_dir, name), self.watermark_image_rgba,
+                                         self.output_path, self.position, quality=self.quality)
+
+    def _replace_output(self, name, output):
+        """Moves a changed file's new result over its previous output. Returns the output name kept."""
+        output_name = os.path.basename(output)
+        previous = self.outputs.get(name)
+        if not previous or previous == output_name:
+            return output_name
+        previous_path = os.path.join(self.output_path, previous)
+        try:
+            if os.path.splitext(previous)[1].lower() == os.path.splitext(output_name)[1].lower():
+                os.replace(output, previous_path)
+                return previous
+            if os.path.exists(previous_path):
+                os.remove(previous_path)  # Saved in another format now
+        except OSError as e:
+            print(f"   Warning: Could not replace previous output {previous}: {e}")
+        return output_name
+
+    def process(self, ready, executor):
+        """Watermarks the ready files on the pool and records the outcome."""
+        if not ready:
+            return 0
+        print(f"\nProcessing {len(ready)} new/changed image(s)...")
+        results = executor.map(self._process_one, [name for name, _ in ready])
+        success_count = 0
+        for (name, sig), output in zip(ready, results):
+            self._pending.pop(name, None)
+            if output:
+                self.outputs[name] = self._replace_output(name, output)
+                self.processed[name] = sig
+                self.failed.pop(name, None)
+                success_count += 1
+            else:
+                self.failed[name] = sig
+                print(f" >> Failed to process {name}")
+        self.save_state()
+        print(f"{success_count}/{len(ready)} images processed successfully.")
+        return success_count
+
+    def poll_once(self, executor):
+        return self.process(self.collect_ready(), executor)
+
+    def run(self, stop_event=None):
+        """Polls until stop_event is set (or Ctrl+C)."""
+        stop_event = stop_event or threading.Event()
+        print(
+            f"Watching {self.input_dir} every {self.poll_interval}s (settle {self.settle_seconds}s, {self.workers} workers)...")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not stop_event.is_set():
+                    try:
+                        self.poll_once(executor)
+                    except OSError as e:
+                        # E.g. a network share that dropped out; keep watching
+                        print(f"Warning: Poll failed, retrying in {self.poll_interval}s: {e}")
+                    stop_event.wait(self.poll_interval)
+            except KeyboardInterrupt:
+                print("Watcher stopped by user.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Watch a folder and watermark new or changed images.")
+    parser.add_argument('input_dir')
+    parser.add_argument('watermark')
+    parser.add_argument('output_dir')
+    parser.add_argument('--position', default='Bottom-Right')
+    parser.add_argument('--quality', type=int, default=95)
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help="Seconds between polls")
+    parser.add_argument('--settle', type=float, default=3.0,
+                        help="Seconds a file must stay unchanged before processing")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--state', default=None,
+                        help="State file (default: inside output_dir)")
+    args = parser.parse_args(argv)
+
+    try:
+        watcher = FolderWatcher(args.input_dir, args.watermark, args.output_dir, args.position,
+                                quality=args.quality, poll_interval=args.interval,
+                                settle_seconds=args.settle, workers=args.workers, state_path=args.state)
+    except (ValueError, FileNotFoundError, processor.WatermarkError) as e:
+        parser.error(str(e))
+    watcher.run()
+
+
+if __name__ == "__main__":
+    main()
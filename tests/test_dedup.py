@@ -0,0 +1,105 @@
+import os
+import shutil
+import tarfile
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from src import dedup, processor, sinks  # noqa: E402
+
+
+def make_inputs(tmp_path):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    first = in_dir / "a.jpg"
+    Image.new("RGB", (200, 150), (10, 120, 200)).save(first)
+    copy = in_dir / "a_copy.jpg"
+    shutil.copyfile(first, copy)
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    return [str(first), str(copy)], str(watermark), str(out_dir)
+
+
+def test_identical_inputs_are_encoded_once(tmp_path, monkeypatch):
+    paths, watermark, out_dir = make_inputs(tmp_path)
+    calls = []
+    real_apply = processor.apply_watermark
+    monkeypatch.setattr(processor, "apply_watermark",
+                        lambda *a, **kw: calls.append(a[0]) or real_apply(*a, **kw))
+
+    assert processor.batch_watermark(paths, watermark, out_dir, "Center") == 2
+
+    assert calls == [paths[0]]
+    assert sorted(os.listdir(out_dir)) == [
+        "a_copy_watermarked.jpg", "a_watermarked.jpg"]
+
+
+def test_failed_copy_leaves_no_empty_file(tmp_path, monkeypatch):
+    paths, watermark, out_dir = make_inputs(tmp_path)
+
+    def failing_copy(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(processor.shutil, "copyfile", failing_copy)
+
+    assert processor.batch_watermark(paths, watermark, out_dir, "Center") == 2
+
+    # The duplicate fell back to normal processing, no zero-byte leftovers
+    outputs = sorted(os.listdir(out_dir))
+    assert outputs == ["a_copy_watermarked.jpg", "a_watermarked.jpg"]
+    assert all(os.path.getsize(os.path.join(out_dir, name)) > 0 for name in outputs)
+
+
+def test_shared_index_never_links_to_another_archive(tmp_path):
+    paths, watermark, out_dir = make_inputs(tmp_path)
+    index = dedup.DedupIndex()
+
+    # Sequential sinks may get the same id() once the first one is gone
+    for n in range(2):
+        archive_path = str(tmp_path / f"out{n}.tar")
+        with sinks.open_archive_sink(archive_path) as sink:
+            assert processor.batch_watermark(paths, watermark, out_dir, "Center",
+                                             sink=sink, dedup=index) == 2
+        del sink
+
+        with tarfile.open(archive_path) as archive:
+            first, copy = archive.getmembers()
+        assert first.isfile() and first.name == "a_watermarked.jpg"
+        assert copy.islnk() and copy.linkname == first.name
+
+
+def count_hashed_inputs(monkeypatch, paths):
+    hashed = []
+    real_fingerprint = dedup.fingerprint
+    monkeypatch.setattr(dedup, "fingerprint",
+                        lambda p: hashed.append(p) or real_fingerprint(p))
+    return lambda: [p for p in hashed if p in paths]
+
+
+def test_inputs_with_a_unique_size_are_not_hashed(tmp_path, monkeypatch):
+    paths, watermark, out_dir = make_inputs(tmp_path)
+    other = str(tmp_path / "in" / "other.jpg")
+    Image.new("RGB", (320, 240), (200, 20, 20)).save(other)
+    hashed = count_hashed_inputs(monkeypatch, paths + [other])
+
+    assert processor.batch_watermark(paths + [other], watermark, out_dir, "Center") == 3
+
+    assert sorted(hashed()) == sorted(paths)
+
+
+def test_unhashed_output_is_reused_by_a_later_run(tmp_path, monkeypatch):
+    paths, watermark, out_dir = make_inputs(tmp_path)
+    state_path = str(tmp_path / "dedup.json")
+    hashed = count_hashed_inputs(monkeypatch, paths)
+
+    processor.batch_watermark(paths[:1], watermark, out_dir, "Center",
+                              dedup=dedup.DedupIndex(state_path=state_path))
+    assert hashed() == []
+
+    index = dedup.DedupIndex(state_path=state_path)
+    processor.batch_watermark(paths[1:], watermark, out_dir, "Center", dedup=index)
+
+    assert index.duplicates == 1
+    assert sorted(hashed()) == sorted(paths)
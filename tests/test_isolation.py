@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from src import dedup, isolation  # noqa: E402
+
+
+@pytest.fixture
+def setup(tmp_path):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    return in_dir, str(watermark), out_dir
+
+
+def make_image(in_dir, name, size=(200, 150), color=(10, 100, 200)):
+    path = in_dir / name
+    Image.new("RGB", size, color).save(path)
+    return str(path)
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_hanging_image_is_retried_then_reported(setup):
+    in_dir, watermark, out_dir = setup
+    # Opening a FIFO without a writer blocks the worker forever
+    hanging = str(in_dir / "hang.jpg")
+    os.mkfifo(hanging)
+    good = make_image(in_dir, "good.jpg")
+
+    result = isolation.isolated_batch_watermark(
+        [hanging, good], watermark, str(out_dir), "Center", workers=2,
+        timeout=1.5, retries=1)
+
+    assert result["succeeded"] == 1 and good in result["outputs"]
+    [failure] = result["failed"]
+    assert failure["path"] == hanging
+    assert failure["reason"] == isolation.REASON_TIMEOUT
+    assert failure["attempts"] == 2
+    assert os.listdir(out_dir) == ["good_watermarked.jpg"]
+
+
+def test_unreadable_and_missing_inputs_are_quarantined(setup, tmp_path):
+    in_dir, watermark, out_dir = setup
+    broken = in_dir / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    missing = str(in_dir / "missing.jpg")
+    quarantine = tmp_path / "quarantine"
+
+    result = isolation.isolated_batch_watermark(
+        [str(broken), missing], watermark, str(out_dir), "Center", workers=1,
+        quarantine_dir=str(quarantine))
+
+    reasons = {f["path"]: f["reason"] for f in result["failed"]}
+    assert reasons == {str(broken): isolation.REASON_UNREADABLE,
+                       missing: isolation.REASON_MISSING}
+    # Not retryable, so each was tried once
+    assert all(f["attempts"] == 1 for f in result["failed"])
+    with open(quarantine / "quarantine.jsonl", encoding="utf-8") as f:
+        logged = [json.loads(line) for line in f]
+    assert sorted(entry["path"] for entry in logged) == sorted(reasons)
+    assert os.listdir(quarantine / isolation.REASON_UNREADABLE) == ["broken.jpg"]
+    assert os.listdir(quarantine / isolation.REASON_MISSING) == []
+    assert os.listdir(out_dir) == []
+
+
+@pytest.mark.parametrize("policy, ok", [("reject", False), ("warn", True)])
+def test_bomb_policy_between_limit_and_twice_the_limit(setup, policy, ok):
+    in_dir, watermark, out_dir = setup
+    image = make_image(in_dir, "large.png", size=(100, 100))
+
+    # 10000 pixels is above the limit but below Pillow's 2x hard error
+    result = isolation.isolated_batch_watermark(
+        [image], watermark, str(out_dir), "Center", workers=1,
+        max_pixels=6000, bomb_policy=policy)
+
+    if ok:
+        assert result["succeeded"] == 1
+    else:
+        [failure] = result["failed"]
+        assert failure["reason"] == isolation.REASON_BOMB
+
+
+def test_workers_are_recycled(setup, monkeypatch):
+    in_dir, watermark, out_dir = setup
+    images = [make_image(in_dir, f"img{i}.jpg", color=(i * 60, 100, 200))
+              for i in range(3)]
+    started = []
+
+    class CountingWorker(isolation._Worker):
+        def __init__(self, *args):
+            super().__init__(*args)
+            started.append(self.process.pid)
+
+    monkeypatch.setattr(isolation, "_Worker", CountingWorker)
+    result = isolation.isolated_batch_watermark(
+        images, watermark, str(out_dir), "Center", workers=1,
+        max_tasks_per_worker=1)
+
+    assert result["succeeded"] == 3
+    # The first worker plus a fresh one after each image
+    assert len(set(started)) == 4
+
+
+def test_identical_inputs_are_encoded_once(setup):
+    in_dir, watermark, out_dir = setup
+    first = make_image(in_dir, "a.jpg")
+    second = str(in_dir / "b.jpg")
+    with open(first, "rb") as src, open(second, "wb") as dst:
+        dst.write(src.read())
+    index = dedup.DedupIndex(use_hardlinks=True)
+
+    result = isolation.isolated_batch_watermark(
+        [first, second], watermark, str(out_dir), "Center", workers=2, dedup=index)
+
+    assert result["succeeded"] == 2
+    assert index.duplicates == 1
+    assert os.path.samefile(result["outputs"][first], result["outputs"][second])
@@ -0,0 +1,63 @@
+import pytest
+
+from src import processor
+
+
+def test_pixel_margin():
+    assert processor.calculate_position(
+        1000, 800, 100, 100, 'Bottom-Right', 50) == (850, 650)
+
+
+def test_fractional_margin_uses_shorter_side():
+    assert processor.calculate_position(
+        1000, 800, 100, 100, 'Top-Left', 0.05) == (40, 40)
+
+
+@pytest.mark.parametrize("margin", [50.0, 0.5, -0.1])
+def test_out_of_range_fractional_margin_is_rejected(margin):
+    with pytest.raises(ValueError):
+        processor.calculate_position(1000, 800, 100, 100, 'Bottom-Right', margin)
+
+
+def test_batch_rejects_bad_margin_before_processing(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    with pytest.raises(ValueError):
+        processor.batch_watermark([], str(watermark), str(tmp_path), 'Auto', margin=50.0)
+
+
+def busy_image_with_calm_corner(calm_corner, size=(800, 600)):
+    """Noisy image with one flat dark quadrant."""
+    Image = pytest.importorskip("PIL.Image")
+    base = Image.effect_noise(size, 120).convert("RGB")
+    width, height = size
+    x = width // 2 if calm_corner.endswith("Right") else 0
+    y = height // 2 if calm_corner.startswith("Bottom") else 0
+    base.paste((20, 20, 20), (x, y, x + width // 2, y + height // 2))
+    return base
+
+
+@pytest.mark.parametrize("calm_corner", processor.AUTO_CANDIDATES)
+def test_auto_position_picks_the_calm_corner(calm_corner):
+    Image = pytest.importorskip("PIL.Image")
+    watermark = Image.new("RGBA", (80, 40), (255, 255, 255, 220))
+
+    assert processor.choose_auto_position(
+        busy_image_with_calm_corner(calm_corner), watermark) == calm_corner
+
+
+def test_batch_with_auto_position_watermarks_the_calm_corner(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    image = tmp_path / "p.png"
+    busy_image_with_calm_corner("Bottom-Right").save(image)
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (80, 40), (255, 255, 255, 255)).save(watermark)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    assert processor.batch_watermark([str(image)], str(watermark), str(out_dir), 'Auto') == 1
+
+    with Image.open(out_dir / "p_watermarked.png") as output:
+        # 800x600 with the default 50 px margin puts an 80x40 mark at (670, 510)
+        assert output.getpixel((710, 530))[:3] == (255, 255, 255)
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from src import sharding  # noqa: E402
+
+
+def make_inputs(tmp_path, count=4):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    paths = []
+    for i in range(count):
+        path = in_dir / f"img{i}.jpg"
+        Image.new("RGB", (200, 150), (i * 40, 100, 200)).save(path)
+        paths.append(str(path))
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    return paths, str(watermark), str(out_dir), str(tmp_path / "work")
+
+
+def test_live_workers_take_over_expired_claim(tmp_path):
+    paths, watermark, out_dir, work_dir = make_inputs(tmp_path)
+    # A worker that claimed img1 and then died without releasing it
+    work = sharding.WorkDir(work_dir, lease_seconds=2)
+    assert work.claim(sharding.item_id(paths[1]), "dead-worker")
+
+    report = sharding.run_local(2, paths, watermark, out_dir, "Center", work_dir,
+                                lease_seconds=2)
+
+    assert report["crashed_workers"] == []
+    assert report["processed"] == len(paths)
+    assert report["failed"] == 0
+    assert report["in_progress"] == 0 and report["expired_claims"] == 0
+    assert report["pending"] == 0
+    assert sorted(os.listdir(out_dir)) == sorted(
+        f"img{i}_watermarked.jpg" for i in range(len(paths)))
+
+
+def test_merged_report_counts_each_item_once(tmp_path):
+    paths, watermark, out_dir, work_dir = make_inputs(tmp_path)
+
+    sharding.run_local(3, paths, watermark, out_dir, "Center", work_dir)
+    # A second run over the same work dir finds everything done
+    report = sharding.run_local(3, paths, watermark, out_dir, "Center", work_dir)
+
+    assert report["processed"] == len(paths)
+    assert report["failed"] == 0
+    assert report["pending"] == 0
+    assert len(os.listdir(out_dir)) == len(paths)
+
+
+def test_sharded_workers_cover_every_item_once(tmp_path):
+    paths, watermark, out_dir, work_dir = make_inputs(tmp_path, count=8)
+
+    report = sharding.run_local(3, paths, watermark, out_dir, "Center", work_dir,
+                                sharded=True)
+
+    assert report["processed"] == len(paths)
+    assert sum(w["processed"] for w in report["workers"]) == len(paths)
+    assert len(os.listdir(out_dir)) == len(paths)
+
+
+def test_local_workers_and_shard_are_exclusive(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        sharding.main(["worker", "wm.png", str(tmp_path), str(tmp_path), "--work-dir",
+                       str(tmp_path), "--local-workers", "2", "--shard", "0/2"])
+    assert "not allowed with" in capsys.readouterr().err
@@ -0,0 +1,50 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from src import sinks
+
+
+def test_incomplete_sink_subclass_fails_on_creation(tmp_path):
+    class HalfSink(sinks.ArchiveSink):
+        def _write_member(self, name, data):
+            pass
+
+    with pytest.raises(TypeError):
+        HalfSink(str(tmp_path / "out.zip"))
+
+
+@pytest.mark.parametrize("archive_name", ["out.zip", "out.tar.gz"])
+def test_names_are_unique_and_duplicates_keep_content(tmp_path, archive_name):
+    archive_path = str(tmp_path / archive_name)
+    with sinks.open_archive_sink(archive_path) as sink:
+        assert sink.write("a_watermarked", ".jpg", b"first") == "a_watermarked.jpg"
+        assert sink.write("a_watermarked", ".jpg", b"second") == "a_watermarked(1).jpg"
+        assert sink.write_duplicate("a_watermarked.jpg", "b_watermarked",
+                                    ".jpg") == "b_watermarked.jpg"
+
+    if archive_name.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            members = {name: archive.read(name) for name in archive.namelist()}
+    else:
+        with tarfile.open(archive_path) as archive:
+            members = {m.name: archive.extractfile(m).read()
+                       for m in archive.getmembers()}
+    assert list(members) == ["a_watermarked.jpg",
+                             "a_watermarked(1).jpg", "b_watermarked.jpg"]
+    assert members["a_watermarked(1).jpg"] == b"second"
+    assert members["b_watermarked.jpg"] == b"first"
+
+
+def test_duplicate_of_unknown_member_is_rejected(tmp_path):
+    with sinks.open_archive_sink(str(tmp_path / "out.tar")) as sink:
+        with pytest.raises(KeyError):
+            sink.write_duplicate("missing.jpg", "b_watermarked", ".jpg")
+        # The failed duplicate did not use up the name
+        assert sink.write("b_watermarked", ".jpg", b"data") == "b_watermarked.jpg"
+
+
+def test_unknown_archive_type_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        sinks.open_archive_sink(str(tmp_path / "out.rar"))
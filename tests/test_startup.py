@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src import icons
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_importing_processor_loads_neither_pillow_nor_tkinter():
+    code = ("import sys, src.processor; "
+            "print(sorted(m for m in ('PIL.Image', 'tkinter') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("name, size", sorted(icons.GUI_ICON_SIZES.items()))
+def test_gui_icons_use_the_shipped_sized_copy(name, size, tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    path = icons.cached_icon_path(icons.resource_path(name), size)
+
+    assert path == os.path.join(ROOT, "assets", "icons",
+                                f"{os.path.splitext(name)[0]}_{size[0]}x{size[1]}.png")
+    with Image.open(path) as icon:
+        assert icon.size == size
+    # Nothing had to be resized at runtime
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,133 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from src import watcher  # noqa: E402
+
+
+def make_dirs(tmp_path):
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    return in_dir, str(watermark), out_dir
+
+
+def settle_and_process(watch):
+    """Runs two scans (start and end of the debounce) and processes what is ready."""
+    watch.collect_ready(now=0)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return watch.process(watch.collect_ready(now=watch.settle_seconds), executor)
+
+
+def test_output_folder_same_as_watch_folder_is_rejected(tmp_path):
+    watermark = tmp_path / "wm.png"
+    Image.new("RGBA", (40, 20), (255, 255, 255, 180)).save(watermark)
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+
+    with pytest.raises(ValueError):
+        watcher.FolderWatcher(str(in_dir), str(watermark),
+                              str(in_dir / ".." / "in"), "Center")
+
+
+def test_missing_watermark_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        watcher.main([str(tmp_path), str(tmp_path / "missing.png"), str(tmp_path / "out")])
+    assert "Watermark file not found" in capsys.readouterr().err
+
+
+def test_run_keeps_polling_after_a_failed_scan(tmp_path, monkeypatch):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    watch = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center",
+                                  poll_interval=0)
+    stop = threading.Event()
+    polls = []
+
+    def flaky_scan():
+        polls.append(1)
+        if len(polls) == 1:
+            raise OSError("share unavailable")
+        stop.set()
+        return {}
+    monkeypatch.setattr(watch, "scan", flaky_scan)
+
+    watch.run(stop)
+
+    assert len(polls) == 2
+
+
+def test_state_does_not_depend_on_how_the_folder_is_spelled(tmp_path):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    Image.new("RGB", (200, 150), (10, 100, 200)).save(in_dir / "p.jpg")
+    first = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center")
+    assert settle_and_process(first) == 1
+
+    respelled = watcher.FolderWatcher(str(in_dir / ".." / "in") + os.sep, watermark,
+                                      str(out_dir), "Center")
+    assert settle_and_process(respelled) == 0
+
+
+def test_changed_file_replaces_its_previous_output(tmp_path):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    image = in_dir / "p.jpg"
+    Image.new("RGB", (200, 150), (10, 100, 200)).save(image)
+    watch = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center")
+    assert settle_and_process(watch) == 1
+
+    Image.new("RGB", (300, 200), (200, 100, 10)).save(image)
+    assert settle_and_process(watch) == 1
+
+    assert sorted(os.listdir(out_dir)) == [watcher.STATE_FILENAME, "p_watermarked.jpg"]
+    with Image.open(out_dir / "p_watermarked.jpg") as output:
+        assert output.size == (300, 200)
+
+
+def test_file_is_only_ready_once_it_stops_changing(tmp_path):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    image = in_dir / "p.jpg"
+    image.write_bytes(b"partial")
+    watch = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center",
+                                  settle_seconds=3)
+
+    assert watch.collect_ready(now=0) == []
+    # Still being copied: the signature changes, so the timer restarts
+    Image.new("RGB", (200, 150), (10, 100, 200)).save(image)
+    assert watch.collect_ready(now=2) == []
+    assert watch.collect_ready(now=4) == []
+    assert [name for name, _ in watch.collect_ready(now=5)] == ["p.jpg"]
+
+
+def test_failed_file_is_retried_only_after_it_changes(tmp_path):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    image = in_dir / "p.jpg"
+    image.write_bytes(b"not an image")
+    watch = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center")
+
+    assert settle_and_process(watch) == 0
+    assert "p.jpg" in watch.failed
+    assert watch.collect_ready(now=10) == []
+
+    Image.new("RGB", (200, 150), (10, 100, 200)).save(image)
+    assert settle_and_process(watch) == 1
+    assert watch.failed == {}
+
+
+def test_restart_skips_files_processed_before(tmp_path):
+    in_dir, watermark, out_dir = make_dirs(tmp_path)
+    for i in range(3):
+        Image.new("RGB", (200, 150), (i * 60, 100, 200)).save(in_dir / f"p{i}.jpg")
+    assert settle_and_process(
+        watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center")) == 3
+
+    restarted = watcher.FolderWatcher(str(in_dir), watermark, str(out_dir), "Center")
+
+    assert len(restarted.processed) == 3
+    assert settle_and_process(restarted) == 0
+    assert len(os.listdir(out_dir)) == 4  # Three outputs plus the state file